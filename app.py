@@ -1,16 +1,24 @@
 import re
 import sys
 import time
+import json
+import hashlib
+import unicodedata
+import uuid
 import numpy as np
+from copy import copy
 import pandas as pd
 import customtkinter as ctk
 from pathlib import Path
 from openpyxl import load_workbook
 from openpyxl.styles import Alignment
+from openpyxl.utils import get_column_letter
 from decimal import Decimal, ROUND_HALF_UP
 from tkinter import filedialog, messagebox
 from decimal import Decimal, ROUND_HALF_UP
 from typing import Dict, List, Tuple, Optional, Union
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
  
 # ---------------- CONFIGURAÇÕES ----------------
 
@@ -24,13 +32,36 @@ DEM_PL_OUT = None
 BALANCETE_SHEET: Optional[Union[str, int]] = None
 COL_CONTA = "V"
 COL_SALDO = "K"
+# Arquivos auxiliares abaixo: nomes relativos são gravados na pasta do arquivo
+# de saída (DEM_PL_OUT), não na pasta de onde o programa foi aberto.
+# Descoberta automática de colunas do balancete (conta, saldo, CNPJ):
+# quantas linhas iniciais sondar e onde guardar os layouts já descobertos
+# por formato de arquivo (None = só em memória)
+BALANCETE_PROBE_LINHAS = 50
+BALANCETE_LAYOUTS_JSON: Optional[str] = "balancete_layouts.json"
 SAFE_SAVE_WITH_SUFFIX = True
+# Diário de proveniência (CSVs acumulados entre execuções; aceitam ".csv.gz"); None desliga.
+# Uma linha por execução (metadados e hashes) e, no outro, as células/contas com o id da execução.
+PROVENIENCIA_CSV: Optional[str] = "Dem_PL_proveniencia.csv"
+PROVENIENCIA_EXECUCOES_CSV: Optional[str] = "Dem_PL_proveniencia_execucoes.csv"
 # Somatórios por bloco (item 7)
 CEL_BLOCO_ACOES      = "J34"
 CEL_BLOCO_RENDA_FIXA = "J40"
 CEL_BLOCO_RECEITAS   = "J45"
 CEL_BLOCO_DESPESAS   = "J55"
-TOTAL_CELLS = {CEL_BLOCO_ACOES, CEL_BLOCO_RENDA_FIXA, CEL_BLOCO_RECEITAS, CEL_BLOCO_DESPESAS}
+CEL_TOTAL_GERAL      = "J58"
+BLOCO_CELULAS = {
+    "ACOES": CEL_BLOCO_ACOES,
+    "RENDA_FIXA": CEL_BLOCO_RENDA_FIXA,
+    "RECEITAS": CEL_BLOCO_RECEITAS,
+    "DESPESAS": CEL_BLOCO_DESPESAS,
+}
+# Layout de células de um modelo: {bloco: célula do total} e célula do total geral.
+# Modelos com outra disposição recebem seu próprio layout no mesmo formato.
+LAYOUT_PADRAO = {"blocos": BLOCO_CELULAS, "total_geral": CEL_TOTAL_GERAL}
+# Conta escrita diretamente (como texto) numa célula fixa da 1ª aba
+CONTA_EXTRA = "61180"
+CEL_EXTRA   = "J23"
 BLOCOS_RECONHECIDOS = {
     "Ações e Opções": "ACOES",
     "Renda fixa e outros valores mobiliários": "RENDA_FIXA",
@@ -40,8 +71,16 @@ BLOCOS_RECONHECIDOS = {
 
  
 NUM_FMT_INT_MIL = "#,##0;(#,##0);-"
+NUM_FMT_TEXTO = "@"
 ALIGN_RIGHT = Alignment(horizontal="right")
 # ---------------- FUNÇÕES ----------------
+def caminho_ao_lado_da_saida(nome: Union[str, Path], saida: Optional[Path] = None) -> Path:
+    """Resolve um arquivo auxiliar na pasta do arquivo de saída (padrão: DEM_PL_OUT)."""
+    p = Path(nome)
+    if p.is_absolute():
+        return p
+    ref = saida if saida is not None else DEM_PL_OUT
+    return (Path(ref).resolve().parent if ref else Path.cwd()) / p
 def excel_col_to_zero_based(col_letter: str) -> int:
     col_letter = col_letter.strip().upper()
     num = 0
@@ -55,12 +94,16 @@ def _read_balancete_df(balancete_path: Path, sheet: Optional[Union[str, int]]) -
     if isinstance(result, dict):
         result = next(iter(result.values()))
     return result
-def build_account_map(balancete_path: Path, sheet, col_conta, col_saldo) -> Dict[str, float]:
-    df = _read_balancete_df(balancete_path, sheet)
+def build_account_map(balancete_path: Path, sheet, col_conta, col_saldo,
+                      df: Optional[pd.DataFrame] = None) -> Dict[str, float]:
+    if df is None:
+        df = _read_balancete_df(balancete_path, sheet)
     idx_conta = excel_col_to_zero_based(col_conta)
     idx_saldo = excel_col_to_zero_based(col_saldo)
-    s_conta = df.iloc[:, idx_conta].astype(str)
-    s_saldo = pd.to_numeric(df.iloc[:, idx_saldo], errors="coerce").fillna(0.0)
+    return _account_map_from_series(df.iloc[:, idx_conta], df.iloc[:, idx_saldo])
+def _account_map_from_series(s_conta: pd.Series, s_saldo: pd.Series) -> Dict[str, float]:
+    s_conta = s_conta.astype(str)
+    s_saldo = pd.to_numeric(s_saldo, errors="coerce").fillna(0.0)
     contas = s_conta.str.extract(r"(\d+)", expand=False)
     tmp = pd.DataFrame({"conta": contas, "saldo": s_saldo}).dropna(subset=["conta"])
     return tmp.groupby("conta")["saldo"].sum().to_dict()
@@ -107,10 +150,33 @@ def safe_save_workbook(wb, path_out: Path):
 # ✅ Item 6 – arredonda por mil
 def round_thousands_cell(value_reais: float) -> int:
     return int((Decimal(value_reais) / Decimal(1000)).quantize(Decimal("0"), rounding=ROUND_HALF_UP))
-def apply_int_mil_format(cell):
-    cell.number_format = "General"
-    cell.number_format = NUM_FMT_INT_MIL
-    cell.alignment = ALIGN_RIGHT
+def escrever_em_lote(ws, valores: Dict[str, object], number_format: str,
+                     alignment: Optional[Alignment] = None, cache: Optional[Dict] = None):
+    """
+    Escreve de uma vez {coordenada: valor} numa aba, todos com o mesmo formato.
+    O cache guarda, por combinação formato/alinhamento e estilo de origem da
+    célula (fonte, borda...), o estilo final já registrado no workbook; cada
+    combinação é montada uma única vez e as demais células só copiam o índice.
+ 
+    Atenção: lê e copia 'cell._style' (StyleArray, atributo privado do openpyxl),
+    validado com openpyxl 3.1.x. NamedStyle não serve aqui porque substituiria
+    fonte/borda/preenchimento próprios de cada célula do modelo; ao atualizar o
+    openpyxl, rode benchmarks/bench_estilos.py para conferir a saída.
+    """
+    cache = {} if cache is None else cache
+    estilos = cache.setdefault((number_format, alignment), {})
+    for coord, valor in valores.items():
+        cell = ws[coord]
+        cell.value = valor
+        origem = tuple(cell._style or ())
+        pronto = estilos.get(origem)
+        if pronto is not None:
+            cell._style = copy(pronto)
+            continue
+        cell.number_format = number_format
+        if alignment is not None:
+            cell.alignment = alignment
+        estilos[origem] = copy(cell._style)
  
  # --- [NOVO] Utilitários para CNPJ --------------------------------------------
 def only_digits(s: str) -> str:
@@ -179,12 +245,15 @@ def mask_cnpj_from_value(val) -> Optional[str]:
     return f"{digits[0:2]}.{digits[2:5]}.{digits[5:8]}/{digits[8:12]}-{digits[12:14]}"
  
  
-def get_cnpj_from_balancete(balancete_path: Path, sheet: Optional[Union[str, int]] = None) -> Optional[str]:
+def get_cnpj_from_balancete(balancete_path: Path, sheet: Optional[Union[str, int]] = None,
+                            df: Optional[pd.DataFrame] = None) -> Optional[str]:
     """
     Procura a coluna 'Cnpj' (case-insensitive). Se não houver, usa a coluna G (índice 6).
     Retorna já no formato: 'CNPJ: 00.000.000/0000-00'.
+    Se 'df' for informado (balancete já lido), não relê o arquivo.
     """
-    df = _read_balancete_df(balancete_path, sheet)
+    if df is None:
+        df = _read_balancete_df(balancete_path, sheet)
  
     # 1) tenta encontrar a coluna 'Cnpj'
     cnpj_col = None
@@ -204,6 +273,10 @@ def get_cnpj_from_balancete(balancete_path: Path, sheet: Optional[Union[str, int
             return None
  
     # 3) percorre até achar um valor válido
+    return _cnpj_from_series(series)
+
+
+def _cnpj_from_series(series) -> Optional[str]:
     for val in series:
         masked = mask_cnpj_from_value(val)
         if masked:
@@ -211,6 +284,266 @@ def get_cnpj_from_balancete(balancete_path: Path, sheet: Optional[Union[str, int
     return None
 
 
+# --- Descoberta de colunas do balancete ----------------------------------------
+_RE_CONTA = re.compile(r"^\d{3,12}$")
+_RE_CNPJ = re.compile(r"^\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}$")
+# Cabeçalhos exatos de conta (normalizados), que valem mais que 'Conta ...' em geral
+CABECALHOS_CONTA = {"conta", "codconta", "codigoconta", "codigodaconta", "contacontabil", "numconta", "noconta"}
+SALDO_PREFIXOS = ("saldo", "vlsaldo", "valorsaldo")
+# Cabeçalhos de saldo que não são o saldo do período (ex.: "Saldo Anterior")
+SALDO_EXCLUIR = ("anterior", "inicial")
+SALDO_PREFERIR = ("atual", "final")
+
+# Layouts já descobertos, por arquivo de cache: {caminho: {formato: layout}}
+_LAYOUTS_BALANCETE: Dict[Optional[Path], Dict[str, Dict]] = {}
+
+
+def _ler_balancete(balancete_path: Path, sheet: Optional[Union[str, int]],
+                   colunas: Optional[List[int]] = None,
+                   max_linhas: Optional[int] = None) -> Tuple[List, List[tuple]]:
+    """
+    Lê o balancete com o openpyxl em modo somente leitura e devolve
+    (cabeçalho, linhas), sem montar DataFrame. Com 'colunas' (índices a partir
+    de 0) só o intervalo entre a menor e a maior vira célula, e cada linha traz
+    apenas essas colunas, na ordem pedida. 'max_linhas' limita as linhas de dados.
+    """
+    wb = load_workbook(balancete_path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if isinstance(sheet, str) else wb.worksheets[sheet or 0]
+        kw = {}
+        if colunas:
+            kw = {"min_col": min(colunas) + 1, "max_col": max(colunas) + 1}
+        if max_linhas is not None:
+            kw["max_row"] = max_linhas + 1
+        linhas = ws.iter_rows(values_only=True, **kw)
+        cabecalho = next(linhas, ())
+        if not colunas:
+            return list(cabecalho), [tuple(r) for r in linhas if r]
+        pos = [c - min(colunas) for c in colunas]
+
+        def escolher(row):
+            return tuple(row[p] if p < len(row) else None for p in pos)
+        return list(escolher(cabecalho)), [escolher(r) for r in linhas if r]
+    finally:
+        wb.close()
+
+
+def _normalizar_cabecalho(nome) -> str:
+    if nome is None:
+        return ""
+    s = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]", "", s.lower())
+
+
+def _cabecalho_conta(h: str) -> bool:
+    """'Conta', 'Conta Contábil', 'Cód. Conta', 'Código da Conta', 'Nº Conta'... (não 'Nome da Conta')."""
+    return (h.startswith("conta") or h in ("noconta", "nconta")
+            or ("conta" in h and h.startswith(("cod", "num", "nr"))))
+
+
+def _cabecalho_saldo(h: str) -> bool:
+    """'Saldo', 'Saldo Atual (R$)', 'Vl. Saldo'... mas não 'Saldo Anterior'."""
+    return h.startswith(SALDO_PREFIXOS) and not any(p in h for p in SALDO_EXCLUIR)
+
+
+def _parece_conta(val) -> bool:
+    """Só inteiros ou texto de dígitos: floats (mesmo 60000.0) são valores, não contas."""
+    if isinstance(val, bool):
+        return False
+    if isinstance(val, (int, np.integer)):
+        return bool(_RE_CONTA.match(str(val)))
+    return isinstance(val, str) and bool(_RE_CONTA.match(val.strip()))
+
+
+def _parece_cnpj(val) -> bool:
+    if isinstance(val, bool) or val is None:
+        return False
+    if isinstance(val, str):
+        return bool(_RE_CNPJ.match(val.strip()))
+    if isinstance(val, float):
+        if not val.is_integer():
+            return False
+        val = int(val)
+    return isinstance(val, (int, np.integer)) and 13 <= len(str(val)) <= 14  # pode perder o zero à esquerda
+
+
+def _parece_saldo(val) -> bool:
+    return isinstance(val, (int, float, np.integer, np.floating)) and not isinstance(val, bool) and not pd.isna(val)
+
+
+def _coluna_atende(valores, teste, minimo: float = 0.8) -> bool:
+    valores = [v for v in valores if not (v is None or (isinstance(v, str) and not v.strip()))]
+    return bool(valores) and sum(1 for v in valores if teste(v)) / len(valores) >= minimo
+
+
+def _letra_coluna(idx: int, cabecalho: List) -> str:
+    nome = cabecalho[idx] if idx < len(cabecalho) else None
+    letra = get_column_letter(idx + 1)
+    return f"{letra} ({nome})" if nome is not None else letra
+
+
+def _unica_coluna(papel: str, candidatos: List[int], preferida: Optional[int], cabecalho: List) -> Optional[int]:
+    """
+    Escolhe entre as colunas candidatas a um papel. Com mais de uma, só usa a
+    coluna configurada (avisando); se ela não estiver entre as candidatas, falha
+    em vez de ficar com a primeira.
+    """
+    if len(candidatos) <= 1:
+        return candidatos[0] if candidatos else None
+    nomes = ", ".join(_letra_coluna(i, cabecalho) for i in candidatos)
+    if preferida in candidatos:
+        print(f"⚠️ Várias colunas servem de {papel} no balancete: {nomes}; "
+              f"usando a configurada, {get_column_letter(preferida + 1)}.")
+        return preferida
+    raise ValueError(f"Coluna de {papel} ambígua no balancete: {nomes}. "
+                     f"Ajuste os cabeçalhos ou a coluna configurada.")
+
+
+def _formato_balancete(balancete_path: Path, sheet) -> str:
+    """Chave do formato do arquivo: nome sem números (datas, códigos) + extensão + aba."""
+    p = Path(balancete_path)
+    nome = re.sub(r"\d+", "#", p.stem)
+    return f"{nome}{p.suffix.lower()}|{sheet if sheet is not None else 0}"
+
+
+def _caminho_layouts(saida: Optional[Path]) -> Optional[Path]:
+    if BALANCETE_LAYOUTS_JSON is None:
+        return None
+    return caminho_ao_lado_da_saida(BALANCETE_LAYOUTS_JSON, saida)
+
+
+def _layouts_balancete(caminho: Optional[Path]) -> Dict[str, Dict]:
+    if caminho not in _LAYOUTS_BALANCETE:
+        _LAYOUTS_BALANCETE[caminho] = {}
+        if caminho is not None and caminho.exists():
+            try:
+                with open(caminho, "r", encoding="utf-8") as f:
+                    _LAYOUTS_BALANCETE[caminho] = json.load(f)
+            except (OSError, ValueError):
+                print(f"⚠️ Cache de layouts inválido, ignorado: {caminho}")
+    return _LAYOUTS_BALANCETE[caminho]
+
+
+def _guardar_layout_balancete(caminho: Optional[Path], formato: str, layout: Dict):
+    layouts = _layouts_balancete(caminho)
+    layouts[formato] = layout
+    if caminho is not None:
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(layouts, f, ensure_ascii=False, indent=2)
+
+
+def sondar_colunas_balancete(balancete_path: Path, sheet: Optional[Union[str, int]] = None) -> Dict:
+    """
+    Lê só as primeiras linhas do balancete (BALANCETE_PROBE_LINHAS) e descobre as
+    colunas de conta, saldo e CNPJ (índices a partir de 0), primeiro pelo nome do
+    cabeçalho e depois pelo padrão dos valores. Devolve também o texto dos
+    cabeçalhos escolhidos, para conferir o layout nas próximas leituras.
+ 
+    Conta: só inteiros (ou texto de dígitos), podendo repetir (build_account_map
+    soma as repetidas); cabeçalho exato ("Conta", "Código Conta") vale mais que
+    "Conta ..." em geral, e colunas com cabeçalho de saldo nunca são conta.
+    Saldo: cabeçalho "Saldo..." (preferindo "atual"/"final", nunca "anterior").
+    Havendo mais de uma candidata, usa a configurada (COL_CONTA, COL_SALDO, G)
+    com aviso, ou falha; sem candidata para conta ou saldo, falha (ValueError).
+    """
+    cabecalho, linhas = _ler_balancete(balancete_path, sheet, max_linhas=BALANCETE_PROBE_LINHAS)
+    largura = max([len(cabecalho)] + [len(r) for r in linhas])
+    cabecalho = cabecalho + [None] * (largura - len(cabecalho))
+    nomes = [_normalizar_cabecalho(c) for c in cabecalho]
+    valores = [[r[i] if i < len(r) else None for r in linhas] for i in range(largura)]
+    idx_conta_cfg = excel_col_to_zero_based(COL_CONTA)
+    idx_saldo_cfg = excel_col_to_zero_based(COL_SALDO)
+
+    def atende(i, teste, minimo=0.8):
+        return _coluna_atende(valores[i], teste, minimo)
+
+    # CNPJ
+    candidatos = [i for i in range(largura) if "cnpj" in nomes[i] and atende(i, _parece_cnpj)]
+    if not candidatos:
+        candidatos = [i for i in range(largura) if atende(i, _parece_cnpj)]
+    cnpj = _unica_coluna("CNPJ", candidatos, 6, cabecalho)
+    if cnpj is None and largura > 6:
+        cnpj = 6  # G = índice 6 (A=0), como antes
+
+    # Conta: pelo cabeçalho (a coluna configurada primeiro, depois os nomes exatos);
+    # senão, colunas só de inteiros que não tenham cabeçalho de saldo
+    livres = [i for i in range(largura) if i != cnpj]
+    candidatos = [i for i in livres if _cabecalho_conta(nomes[i]) and atende(i, _parece_conta)]
+    if idx_conta_cfg not in candidatos:
+        candidatos = [i for i in candidatos if nomes[i] in CABECALHOS_CONTA] or candidatos
+    if not candidatos:
+        candidatos = [i for i in livres if not nomes[i].startswith(SALDO_PREFIXOS)
+                      and atende(i, _parece_conta, 1.0)]
+    conta = _unica_coluna("conta", candidatos, idx_conta_cfg, cabecalho)
+    if conta is None:
+        raise ValueError(f"Coluna de conta não encontrada no balancete {balancete_path} "
+                         f"(nenhum cabeçalho 'Conta' nem coluna só de códigos numéricos).")
+
+    # Saldo: pelo cabeçalho, preferindo "atual"/"final"; senão, colunas numéricas
+    # cujo cabeçalho não seja de outro saldo (ex.: "Saldo Anterior")
+    livres = [i for i in livres if i != conta]
+    por_cabecalho = [i for i in livres if _cabecalho_saldo(nomes[i]) and atende(i, _parece_saldo)]
+    preferidos = [i for i in por_cabecalho if any(p in nomes[i] for p in SALDO_PREFERIR)]
+    candidatos = preferidos or por_cabecalho
+    if not candidatos:
+        candidatos = [i for i in livres if not nomes[i].startswith(SALDO_PREFIXOS) and atende(i, _parece_saldo)]
+    saldo = _unica_coluna("saldo", candidatos, idx_saldo_cfg, cabecalho)
+    if saldo is None:
+        raise ValueError(f"Coluna de saldo não encontrada no balancete {balancete_path}.")
+
+    layout = {"conta": conta, "saldo": saldo, "cnpj": cnpj}
+    layout["cabecalhos"] = {k: (None if i is None or cabecalho[i] is None else str(cabecalho[i]))
+                            for k, i in layout.items()}
+    return layout
+
+
+def _ler_com_layout(balancete_path: Path, sheet, layout: Dict) -> Tuple[bool, Dict[str, float], Optional[str]]:
+    """Lê só as colunas do layout; devolve (cabeçalhos_conferem, mapa_de_contas, cnpj_str)."""
+    papeis = [p for p in ("conta", "saldo", "cnpj") if layout.get(p) is not None]
+    cabecalho, linhas = _ler_balancete(balancete_path, sheet, [layout[p] for p in papeis])
+    esperados = layout.get("cabecalhos") or {}
+    conferem = all(_normalizar_cabecalho(esperados.get(p)) == _normalizar_cabecalho(cabecalho[k])
+                   for k, p in enumerate(papeis))
+    if not conferem:
+        return False, {}, None
+    colunas = dict(zip(papeis, zip(*linhas))) if linhas else {p: () for p in papeis}
+    acc_map = _account_map_from_series(pd.Series(colunas["conta"], dtype=object),
+                                       pd.Series(colunas["saldo"], dtype=object))
+    cnpj_str = _cnpj_from_series(colunas["cnpj"]) if "cnpj" in colunas else None
+    return True, acc_map, cnpj_str
+
+
+def carregar_balancete(balancete_path: Path, sheet: Optional[Union[str, int]] = None,
+                       saida: Optional[Path] = None) -> Tuple[Dict[str, float], Optional[str]]:
+    """
+    Carrega do balancete só as colunas necessárias e devolve (mapa_de_contas, cnpj_str).
+ 
+    As colunas vêm do layout já conhecido para o formato do arquivo, desde que
+    os cabeçalhos guardados confiram com os do arquivo e a leitura traga contas;
+    senão (ou se ainda não houver layout), sonda as primeiras linhas e lê de novo.
+    Só um layout que trouxe contas é guardado; se nem a sondagem trouxer, falha
+    (ValueError). O cache de layouts (BALANCETE_LAYOUTS_JSON) fica na pasta de
+    'saida' (padrão: DEM_PL_OUT).
+    """
+    formato = _formato_balancete(balancete_path, sheet)
+    caminho_cache = _caminho_layouts(saida)
+    layout = _layouts_balancete(caminho_cache).get(formato)
+    if layout is not None:
+        conferem, acc_map, cnpj_str = _ler_com_layout(balancete_path, sheet, layout)
+        if conferem and acc_map:
+            return acc_map, cnpj_str
+        print(f"⚠️ Layout guardado não confere com {Path(balancete_path).name}; sondando as colunas de novo.")
+
+    layout = sondar_colunas_balancete(balancete_path, sheet)
+    _, acc_map, cnpj_str = _ler_com_layout(balancete_path, sheet, layout)
+    if not acc_map:
+        raise ValueError(f"Nenhuma conta lida do balancete {balancete_path} "
+                         f"(conta em {get_column_letter(layout['conta'] + 1)}, "
+                         f"saldo em {get_column_letter(layout['saldo'] + 1)}).")
+    _guardar_layout_balancete(caminho_cache, formato, layout)
+    return acc_map, cnpj_str
+
+
 def formatar_ptbr(num: Decimal, casas: int = 3) -> str:
     """
     Formata número para PT-BR com separador de milhar '.' e decimal ','.
@@ -405,7 +738,178 @@ from pathlib import Path
 from typing import Dict, Optional
 from openpyxl import load_workbook
  
-def replace_in_dem_pl(dem_in: Path,dem_out: Path,acc_map: Dict[str, float],cnpj_str: Optional[str] = None) -> Path:
+PROVENIENCIA_EXECUCOES_COLUNAS = [
+    "execucao_id", "data", "tipo", "cnpj", "arquivo_saida", "hash_modelo",
+    "hash_balancete", "hash_carteira", "hash_movimento", "hash_correcao",
+]
+PROVENIENCIA_COLUNAS = [
+    "execucao_id", "registro", "celula", "bloco", "expressao", "conta",
+    "valor_reais", "valor_mil", "ocorrencias_ausente",
+]
+
+
+def file_sha256(path: Optional[Path]) -> Optional[str]:
+    """SHA-256 do arquivo (lido em blocos), ou None se o arquivo não existir."""
+    if path is None or not Path(path).exists():
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _acrescentar_csv(df: pd.DataFrame, caminho: Path):
+    df.to_csv(caminho, sep=";", index=False, encoding="utf-8", mode="a", header=not caminho.exists())
+
+
+def gravar_proveniencia(path_saida: Path, changes: List[Tuple], totals_por_conta: Dict[str, float],
+                        missing_codes: Dict[str, int], metadados: Dict[str, Optional[str]]) -> Optional[str]:
+    """
+    Acrescenta esta execução ao diário de proveniência, na pasta de 'path_saida':
+      - PROVENIENCIA_EXECUCOES_CSV: uma linha com id, data, tipo, CNPJ, saída e
+        hashes dos arquivos de entrada ('metadados');
+      - PROVENIENCIA_CSV: registro="celula", uma por célula substituída (aba!célula,
+        expressão original, contas, bloco, valor em reais e em milhares), e
+        registro="conta", uma por conta usada (soma em reais e quantas vezes não
+        foi encontrada no balancete), todas só com o id da execução.
+    Separador ';'; cabeçalho só em arquivo novo; ".csv.gz" é gravado comprimido.
+    Retorna o id da execução (None se o diário estiver desligado).
+    """
+    if PROVENIENCIA_CSV is None or PROVENIENCIA_EXECUCOES_CSV is None:
+        return None
+    execucao_id = uuid.uuid4().hex[:12]
+
+    execucao = pd.DataFrame([{"execucao_id": execucao_id, **metadados}], columns=PROVENIENCIA_EXECUCOES_COLUNAS)
+    _acrescentar_csv(execucao, caminho_ao_lado_da_saida(PROVENIENCIA_EXECUCOES_CSV, path_saida))
+
+    linhas = []
+    for celula, expr, total_reais, val_mil, bloco in changes:
+        linhas.append({
+            "registro": "celula", "celula": celula, "bloco": bloco, "expressao": expr,
+            "conta": "+".join(parse_accounts_from_cell(expr)),
+            "valor_reais": total_reais, "valor_mil": val_mil,
+        })
+    for conta, total_reais in totals_por_conta.items():
+        linhas.append({
+            "registro": "conta", "conta": conta, "valor_reais": total_reais,
+            "ocorrencias_ausente": missing_codes.get(conta, 0),
+        })
+
+    df = pd.DataFrame(linhas, columns=PROVENIENCIA_COLUNAS)
+    df["execucao_id"] = execucao_id
+    df["valor_mil"] = df["valor_mil"].astype("Int64")
+    df["ocorrencias_ausente"] = df["ocorrencias_ausente"].astype("Int64")
+    _acrescentar_csv(df, caminho_ao_lado_da_saida(PROVENIENCIA_CSV, path_saida))
+    return execucao_id
+
+
+# Modelos já compilados nesta sessão, por hash do arquivo e layout
+_MODELOS_COMPILADOS: Dict[Tuple, Dict] = {}
+
+
+def _chave_modelo(dem_in: Path, layout: Dict) -> Tuple:
+    return (file_sha256(dem_in), tuple(sorted(layout["blocos"].items())), layout["total_geral"])
+
+
+def compilar_modelo(wb, layout: Optional[Dict] = None) -> Dict:
+    """
+    Varre o modelo Dem-PL uma única vez e devolve sua estrutura:
+      - "celulas": lista de dicts {aba, celula, expressao, contas, bloco, rotulo, tipo},
+        na ordem de escrita ("valor" = célula calculada; "extra" = CONTA_EXTRA em CEL_EXTRA);
+      - "indice": índice reverso {conta: [posições em "celulas"]};
+      - "layout": células de total do modelo (LAYOUT_PADRAO se não informado).
+    O rótulo é o primeiro texto sem contas à esquerda da célula, na mesma linha.
+    """
+    layout = layout or LAYOUT_PADRAO
+    celulas_total = {c.upper() for c in layout["blocos"].values()}
+    celulas: List[Dict] = []
+    indice: Dict[str, List[int]] = {}
+
+    def registrar(entrada: Dict):
+        pos = len(celulas)
+        celulas.append(entrada)
+        for c in dict.fromkeys(entrada["contas"]):
+            indice.setdefault(c, []).append(pos)
+
+    bloco_atual = None
+    for ws in wb.worksheets:
+        for row in ws.iter_rows():
+            if not row:
+                continue
+            # Verifica o bloco pela coluna A (primeira coluna)
+            col_a_val = row[0].value
+            if isinstance(col_a_val, str):
+                key = col_a_val.strip()
+                if key in BLOCOS_RECONHECIDOS:
+                    bloco_atual = BLOCOS_RECONHECIDOS[key]
+
+            rotulo = None
+            for cell in row:
+                # Só interessa se a célula "parece" conter contas
+                if not should_replace_cell(cell.value):
+                    if rotulo is None and isinstance(cell.value, str) and cell.value.strip():
+                        rotulo = cell.value.strip()
+                    continue
+
+                # Não mexer nas células de total consolidadas
+                if cell.coordinate.upper() in celulas_total:
+                    continue
+
+                raw_expr = str(cell.value)
+                contas = parse_accounts_from_cell(raw_expr)
+                if not contas:
+                    continue
+
+                registrar({
+                    "aba": ws.title, "celula": cell.coordinate, "expressao": raw_expr,
+                    "contas": contas, "bloco": bloco_atual, "rotulo": rotulo, "tipo": "valor",
+                })
+
+    registrar({
+        "aba": wb.worksheets[0].title, "celula": CEL_EXTRA, "expressao": None,
+        "contas": [CONTA_EXTRA], "bloco": None, "rotulo": None, "tipo": "extra",
+    })
+    return {"celulas": celulas, "indice": indice, "layout": layout}
+
+
+def compilar_modelo_arquivo(dem_in: Path, layout: Optional[Dict] = None) -> Dict:
+    """
+    Compila o modelo a partir do arquivo, reaproveitando o resultado enquanto o arquivo não mudar.
+    Abre o modelo do mesmo jeito que _preencher_modelo, para que as posições do índice
+    sejam exatamente as da geração completa.
+    """
+    layout = layout or LAYOUT_PADRAO
+    chave = _chave_modelo(dem_in, layout)
+    if chave not in _MODELOS_COMPILADOS:
+        _MODELOS_COMPILADOS[chave] = compilar_modelo(load_workbook(dem_in, data_only=False), layout)
+    return _MODELOS_COMPILADOS[chave]
+
+
+def linhas_da_conta(compilado: Dict, conta: str) -> List[Dict]:
+    """
+    Responde "quais linhas do relatório a conta alimenta?" consultando o índice reverso.
+    Cada célula aparece uma vez (CEL_EXTRA pode ser também uma célula de contas do modelo).
+    """
+    linhas = []
+    vistas = set()
+    for pos in compilado["indice"].get(str(conta), []):
+        e = compilado["celulas"][pos]
+        celula = f"{e['aba']}!{e['celula']}"
+        if celula in vistas:
+            continue
+        vistas.add(celula)
+        linhas.append({
+            "celula": celula,
+            "rotulo": e["rotulo"],
+            "bloco": e["bloco"],
+            "total_bloco": compilado["layout"]["blocos"].get(e["bloco"]),
+        })
+    return linhas
+
+
+def replace_in_dem_pl(dem_in: Path,dem_out: Path,acc_map: Dict[str, float],cnpj_str: Optional[str] = None,
+                      arquivos_origem: Optional[Dict[str, Path]] = None, layout: Optional[Dict] = None) -> Path:
     """
     Abre o modelo Dem-PL, percorre todas as abas substituindo células que contenham
     referências a contas do balancete pelas somas correspondentes (em milhares, com
@@ -430,67 +934,108 @@ def replace_in_dem_pl(dem_in: Path,dem_out: Path,acc_map: Dict[str, float],cnpj_
         Mapa {codigo_conta: saldo_em_reais} extraído do balancete.
     cnpj_str : Optional[str]
         Texto já formatado do CNPJ (ex.: "CNPJ: 00.000.000/0000-00"). Se None, não escreve.
+    arquivos_origem : Optional[Dict[str, Path]]
+        Arquivos de entrada da execução ("balancete", "carteira", "movimento"),
+        cujos hashes vão para o diário de proveniência (PROVENIENCIA_EXECUCOES_CSV).
+    layout : Optional[Dict]
+        Células de total do modelo (ver LAYOUT_PADRAO).
+    """
+    # --- NOVO: preencher D18 com NCotas da Carteira Diária ---
+    textos = {}
+    if CARTEIRA_CSV is not None and CARTEIRA_CSV.exists():
+        val_d18 = get_last_ncotas(CARTEIRA_CSV)
+        if val_d18:
+            textos["D18"] = val_d18
+            print(f"[DEBUG] Valor NCotas formatado para D18: {val_d18}")
+ 
+    path_saida, changes, totals_por_conta, missing_codes = _preencher_modelo(
+        dem_in, dem_out, acc_map, cnpj_str, layout, textos)
+ 
+    # ---------------------------
+    # Passo 5: Diário de proveniência (acumulado entre execuções)
+    # ---------------------------
+    _registrar_execucao(dem_in, path_saida, cnpj_str, arquivos_origem, changes, totals_por_conta, missing_codes)
+ 
+    return path_saida
+ 
+ 
+def _registrar_execucao(dem_in: Path, path_saida: Path, cnpj_str: Optional[str],
+                        arquivos_origem: Optional[Dict[str, Path]], changes: List[Tuple],
+                        totals_por_conta: Dict[str, float], missing_codes: Dict[str, int],
+                        tipo: str = "completa", arquivo_correcao: Optional[Path] = None):
+    origem = arquivos_origem or {}
+    gravar_proveniencia(path_saida, changes, totals_por_conta, missing_codes, {
+        "data": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "tipo": tipo,
+        "cnpj": cnpj_str,
+        "arquivo_saida": str(Path(path_saida).resolve()),
+        "hash_modelo": file_sha256(dem_in),
+        "hash_balancete": file_sha256(origem.get("balancete")),
+        "hash_carteira": file_sha256(origem.get("carteira")),
+        "hash_movimento": file_sha256(origem.get("movimento")),
+        "hash_correcao": file_sha256(arquivo_correcao),
+    })
+ 
+ 
+def _preencher_modelo(dem_in: Path, dem_out: Path, acc_map: Dict[str, float], cnpj_str: Optional[str],
+                      layout: Optional[Dict], textos_adicionais: Dict[str, str]) -> Tuple:
+    """
+    Preenche e salva um modelo (núcleo de replace_in_dem_pl, sem o diário).
+    'textos_adicionais' são células de texto da 1ª aba (D18, D20, D22...).
+    Retorna (caminho_efetivo, changes, totals_por_conta, missing_codes).
+    Fica no nível do módulo para poder rodar em outro processo.
     """
-    # Abre o workbook do modelo
+    # Abre o workbook do modelo e compila sua estrutura (guardada para correções)
     wb = load_workbook(dem_in, data_only=False)
+    compilado = compilar_modelo(wb, layout)
+    layout = compilado["layout"]
+    _MODELOS_COMPILADOS[_chave_modelo(dem_in, layout)] = compilado
  
-    # Acumuladores opcionais (mantidos caso você queira usar no futuro)
+    # Acumuladores usados no diário de proveniência
     changes = []
     totals_por_conta = {}
     missing_codes = {}
  
+    # Escritas acumuladas por aba ({titulo: {coordenada: valor}}), aplicadas em lote
+    escritas: Dict[str, Dict[str, int]] = {ws.title: {} for ws in wb.worksheets}
+    cache_estilos: Dict = {}
+ 
     # Somatórios por bloco (em milhares)
-    soma_blocos = {"ACOES": 0, "RENDA_FIXA": 0, "RECEITAS": 0, "DESPESAS": 0}
-    bloco_atual = None
+    soma_blocos = {key: 0 for key in layout["blocos"]}
  
     # ---------------------------
-    # Passo 1: Varre TODAS as abas e substitui as células "calculáveis"
+    # Passo 1: Substitui as células "calculáveis" de TODAS as abas
     # ---------------------------
-    for ws in wb.worksheets:
-        for row in ws.iter_rows():
-            # Verifica o bloco pela coluna A (primeira coluna)
-            col_a_val = row[0].value
-            if isinstance(col_a_val, str):
-                key = col_a_val.strip()
-                if key in BLOCOS_RECONHECIDOS:
-                    bloco_atual = BLOCOS_RECONHECIDOS[key]
- 
-            for cell in row:
-                # Não mexer nas células de total consolidadas
-                if cell.coordinate.upper() in TOTAL_CELLS:
-                    continue
- 
-                # Só tentamos substituir se a célula "parece" conter contas
-                if not should_replace_cell(cell.value):
-                    continue
+    for entrada in compilado["celulas"]:
+        if entrada["tipo"] != "valor":
+            continue
+        contas = entrada["contas"]
+        bloco_atual = entrada["bloco"]
  
-                raw_expr = str(cell.value)
-                contas = parse_accounts_from_cell(raw_expr)
-                if not contas:
-                    continue
+        # Soma em reais das contas existentes no mapa
+        total_reais = 0.0
+        for c in contas:
+            v = float(acc_map.get(c, 0.0))
+            total_reais += v
+            totals_por_conta[c] = totals_por_conta.get(c, 0.0) + v
+            if c not in acc_map:
+                missing_codes[c] = missing_codes.get(c, 0) + 1
  
-                # Soma em reais das contas existentes no mapa
-                total_reais = 0.0
-                for c in contas:
-                    v = float(acc_map.get(c, 0.0))
-                    total_reais += v
-                    totals_por_conta[c] = totals_por_conta.get(c, 0.0) + v
-                    if c not in acc_map:
-                        missing_codes[c] = missing_codes.get(c, 0) + 1
+        # Converte para inteiro em milhares, com arredondamento HALF_UP
+        val_mil = round_thousands_cell(total_reais)
  
-                # Converte para inteiro em milhares, com arredondamento HALF_UP
-                val_mil = round_thousands_cell(total_reais)
+        # Agenda a escrita (valor + formatação aplicados em lote por aba)
+        escritas[entrada["aba"]][entrada["celula"]] = val_mil
  
-                # Escreve o valor e aplica formatação
-                cell.value = val_mil
-                apply_int_mil_format(cell)
+        # Log da mudança
+        changes.append((f"{entrada['aba']}!{entrada['celula']}", entrada["expressao"], total_reais, val_mil, bloco_atual))
  
-                # Log opcional da mudança
-                changes.append((f"{ws.title}!{cell.coordinate}", raw_expr, total_reais, val_mil))
+        # Acumula no bloco atual (se estivermos dentro de um bloco reconhecido)
+        if bloco_atual in soma_blocos:
+            soma_blocos[bloco_atual] += val_mil
  
-                # Acumula no bloco atual (se estivermos dentro de um bloco reconhecido)
-                if bloco_atual in soma_blocos:
-                    soma_blocos[bloco_atual] += val_mil
+    for ws in wb.worksheets:
+        escrever_em_lote(ws, escritas[ws.title], NUM_FMT_INT_MIL, ALIGN_RIGHT, cache_estilos)
  
     # ---------------------------
     # Passo 2: Atualiza a 1ª ABA com os somatórios e o total geral
@@ -498,31 +1043,14 @@ def replace_in_dem_pl(dem_in: Path,dem_out: Path,acc_map: Dict[str, float],cnpj_
     ws0 = wb.worksheets[0]
  
     # Preenche cada célula de bloco
-    for coord, key in [
-        (CEL_BLOCO_ACOES, "ACOES"),
-        (CEL_BLOCO_RENDA_FIXA, "RENDA_FIXA"),
-        (CEL_BLOCO_RECEITAS, "RECEITAS"),
-        (CEL_BLOCO_DESPESAS, "DESPESAS"),
-    ]:
-        ws0[coord].value = soma_blocos[key]
-        apply_int_mil_format(ws0[coord])
+    totais = {layout["blocos"][key]: soma for key, soma in soma_blocos.items()}
  
     # Total geral (J58) = soma dos inteiros em milhares
-    CEL_TOTAL_GERAL = "J58"
-    total_geral = (
-        soma_blocos["ACOES"]
-        + soma_blocos["RENDA_FIXA"]
-        + soma_blocos["RECEITAS"]
-        + soma_blocos["DESPESAS"]
-    )
-    ws0[CEL_TOTAL_GERAL].value = total_geral
-    apply_int_mil_format(ws0[CEL_TOTAL_GERAL])
+    totais[layout["total_geral"]] = sum(soma_blocos.values())
+    escrever_em_lote(ws0, totais, NUM_FMT_INT_MIL, ALIGN_RIGHT, cache_estilos)
 
 
     # --- NOVO: incluir conta 61180 na célula J23 ---
-    CONTA_EXTRA = "61180"
-    CEL_EXTRA = "J23"
-
     # Busca saldo da conta no mapa acc_map (já carregado do balancete)
     saldo_reais = float(acc_map.get(CONTA_EXTRA, 0.0))
 
@@ -532,52 +1060,145 @@ def replace_in_dem_pl(dem_in: Path,dem_out: Path,acc_map: Dict[str, float],cnpj_
     # Formata conforme regra
     valor_formatado = format_valor_milhares(valor_mil)
 
-    # Escreve na célula J23
-    ws0[CEL_EXTRA].value = valor_formatado
-    ws0[CEL_EXTRA].number_format = "@"
-
-
-    
-    # --- NOVO: preencher D18 com NCotas da Carteira Diária ---
-    
-    if CARTEIRA_CSV.exists():
-        val_d18 = get_last_ncotas(CARTEIRA_CSV)
-        if val_d18:
-            ws0["D18"].value = val_d18
-            print(f"[DEBUG] Valor NCotas formatado para D18: {val_d18}")
-            ws0["D18"].number_format = "@"
+    # Células de texto da 1ª aba (J23, D18, D20/D22...), escritas em lote no final
+    textos = {CEL_EXTRA: valor_formatado, **textos_adicionais}
+ 
+    escrever_em_lote(ws0, textos, NUM_FMT_TEXTO, cache=cache_estilos)
 
  
     # ---------------------------
     # Passo 3: CNPJ em L8 (como texto), se informado
     # ---------------------------
     if cnpj_str:
-        ws0["L8"].value = str(cnpj_str)      # garante string
-        ws0["L8"].number_format = "@"        # força formato TEXTO
-        try:
-            ws0["L8"].alignment = ALIGN_RIGHT
-        except Exception:
-            pass
+        # garante string, formato TEXTO e alinhamento à direita
+        escrever_em_lote(ws0, {"L8": str(cnpj_str)}, NUM_FMT_TEXTO, ALIGN_RIGHT, cache_estilos)
  
     # ---------------------------
     # Passo 4: Salvar e retornar o caminho efetivo
     # ---------------------------
     path_saida = safe_save_workbook(wb, dem_out)
  
-
-def preencher_movimento_cotistas(dem_out: Path, mov_path: Path):
+    return path_saida, changes, totals_por_conta, missing_codes
+ 
+ 
+def aplicar_correcao(dem_in: Path, dem_out: Path, acc_map: Dict[str, float], correcao: Dict[str, float],
+                     como_delta: bool = False, arquivo_correcao: Optional[Path] = None,
+                     layout: Optional[Dict] = None, cnpj_str: Optional[str] = None,
+                     arquivos_origem: Optional[Dict[str, Path]] = None) -> Path:
     """
-    Lê o arquivo Movimento de Cotistas (CSV), ajusta cabeçalho, extrai os últimos valores
-    das colunas NCATOT_Tot e NCRTOT_Tot, formata e escreve nas células D20 e D22 do Excel.
+    Aplica uma correção do balancete a um Dem-PL já gerado, sem refazer tudo:
+    pelo índice reverso do modelo compilado, recalcula só as células que usam as
+    contas corrigidas (inclusive CONTA_EXTRA em CEL_EXTRA) e regrava apenas elas,
+    os totais dos blocos afetados e o total geral. Os totais são somados de novo
+    a partir das células do bloco (não pela diferença), então reaplicar a mesma
+    correção não muda nada.
+ 
+    Parâmetros
+    ----------
+    dem_in : Path
+        Modelo Dem-PL usado na geração original.
+    dem_out : Path
+        Arquivo já gerado, que será corrigido.
+    acc_map : Dict[str, float]
+        Mapa de contas usado na geração original.
+    correcao : Dict[str, float]
+        {codigo_conta: novo_saldo} (ex.: build_account_map do arquivo de correção)
+        ou, com como_delta=True, {codigo_conta: variação_em_reais}.
+    arquivo_correcao : Optional[Path]
+        Arquivo de onde veio a correção; seu hash vai para o diário de proveniência.
+    layout : Optional[Dict]
+        Células de total do modelo (ver LAYOUT_PADRAO).
+    cnpj_str : Optional[str]
+        CNPJ do fundo para o diário; se None, usa o que está em L8 no arquivo gerado.
+    arquivos_origem : Optional[Dict[str, Path]]
+        Arquivos da geração original ("balancete", "carteira", "movimento"), para o diário.
+    """
+    compilado = compilar_modelo_arquivo(dem_in, layout)
+    blocos = compilado["layout"]["blocos"]
+    cel_total_geral = compilado["layout"]["total_geral"]
+ 
+    novo_map = dict(acc_map)
+    for c, v in correcao.items():
+        novo_map[c] = float(acc_map.get(c, 0.0)) + float(v) if como_delta else float(v)
+    alteradas = {c for c in correcao if float(novo_map[c]) != float(acc_map.get(c, 0.0))}
+    afetadas = sorted({pos for c in alteradas for pos in compilado["indice"].get(c, [])})
+    if not afetadas:
+        return dem_out
+ 
+    wb = load_workbook(dem_out)
+    ws0 = wb.worksheets[0]
+    abas = {ws.title: ws for ws in wb.worksheets}
+    escritas: Dict[str, Dict[str, int]] = {ws.title: {} for ws in wb.worksheets}
+    textos: Dict[str, str] = {}
+    blocos_afetados = set()
+    changes = []
+    totals_por_conta: Dict[str, float] = {}
+    missing_codes: Dict[str, int] = {}
+    if cnpj_str is None and isinstance(ws0["L8"].value, str):
+        cnpj_str = ws0["L8"].value
+ 
+    for pos in afetadas:
+        entrada = compilado["celulas"][pos]
+        if entrada["tipo"] == "extra":
+            textos[entrada["celula"]] = format_valor_milhares(
+                round_thousands_cell(float(novo_map.get(CONTA_EXTRA, 0.0))))
+            continue
+ 
+        total_reais = sum(float(novo_map.get(c, 0.0)) for c in entrada["contas"])
+        val_mil = round_thousands_cell(total_reais)
+        # Em CEL_EXTRA da 1ª aba a geração completa deixa o texto de CONTA_EXTRA por cima
+        # do valor; o valor só entra no total do bloco
+        if not (entrada["aba"] == ws0.title and entrada["celula"] == CEL_EXTRA):
+            escritas[entrada["aba"]][entrada["celula"]] = val_mil
+        changes.append((f"{entrada['aba']}!{entrada['celula']}", entrada["expressao"], total_reais, val_mil, entrada["bloco"]))
+        for c in entrada["contas"]:
+            totals_por_conta[c] = totals_por_conta.get(c, 0.0) + float(novo_map.get(c, 0.0))
+            if c not in novo_map:
+                missing_codes[c] = missing_codes.get(c, 0) + 1
+ 
+        if entrada["bloco"] in blocos:
+            blocos_afetados.add(entrada["bloco"])
+ 
+    cache_estilos: Dict = {}
+    for ws in wb.worksheets:
+        escrever_em_lote(ws, escritas[ws.title], NUM_FMT_INT_MIL, ALIGN_RIGHT, cache_estilos)
+ 
+    # Totais dos blocos afetados: soma dos valores já gravados em todas as células
+    # do bloco (células sem número, como CEL_EXTRA, são recalculadas pelo mapa)
+    if blocos_afetados:
+        soma_blocos = {bloco: 0 for bloco in blocos_afetados}
+        for entrada in compilado["celulas"]:
+            if entrada["tipo"] != "valor" or entrada["bloco"] not in soma_blocos:
+                continue
+            valor = abas[entrada["aba"]][entrada["celula"]].value
+            if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+                valor = round_thousands_cell(sum(float(novo_map.get(c, 0.0)) for c in entrada["contas"]))
+            soma_blocos[entrada["bloco"]] += int(valor)
+        totais = {blocos[bloco]: soma for bloco, soma in soma_blocos.items()}
+        totais[cel_total_geral] = sum(
+            soma_blocos[b] if b in soma_blocos else int(ws0[coord].value or 0) for b, coord in blocos.items())
+        escrever_em_lote(ws0, totais, NUM_FMT_INT_MIL, ALIGN_RIGHT, cache_estilos)
+    escrever_em_lote(ws0, textos, NUM_FMT_TEXTO, cache=cache_estilos)
+ 
+    path_saida = safe_save_workbook(wb, dem_out)
+ 
+    _registrar_execucao(dem_in, path_saida, cnpj_str, arquivos_origem, changes, totals_por_conta, missing_codes,
+                        tipo="correcao", arquivo_correcao=arquivo_correcao)
+ 
+    return path_saida
+ 
+ 
+def ler_movimento_cotistas(mov_path: Path) -> Optional[Dict[str, str]]:
+    """
+    Lê o arquivo Movimento de Cotistas (CSV), ajusta cabeçalho e devolve os últimos
+    valores das colunas NCATOT_Tot e NCRTOT_Tot já formatados, como {'D20': ..., 'D22': ...}.
+    Em caso de problema, imprime o erro e retorna None.
     """
     try:
-        # 1. Verificar se os arquivos existem
+        # 1. Verificar se o arquivo existe
         if not mov_path.exists():
             print(f"ERRO — Arquivo Movimento de Cotistas não encontrado: {mov_path}")
-            return
-        if not dem_out.exists():
-            print(f"ERRO — Arquivo Dem_PL_Modelo_preenchido não encontrado: {dem_out}")
-            return
+            return None
 
         # 2. Ler todas as linhas do CSV
         with open(mov_path, 'r', encoding='latin1') as f:
@@ -585,7 +1206,7 @@ def preencher_movimento_cotistas(dem_out: Path, mov_path: Path):
 
         if len(linhas) < 2:
             print("ERRO — Arquivo Movimento de Cotistas está vazio ou inválido.")
-            return
+            return None
 
         # 3. Ajustar cabeçalho (última linha vira header)
         header = linhas[-1].strip().split(';')
@@ -597,7 +1218,7 @@ def preencher_movimento_cotistas(dem_out: Path, mov_path: Path):
         # 5. Verificar colunas
         if 'NCATOT_Tot' not in df_mov.columns or 'NCRTOT_Tot' not in df_mov.columns:
             print("ERRO — Colunas NCATOT_Tot ou NCRTOT_Tot não encontradas no arquivo.")
-            return
+            return None
 
         # 6. Extrair últimos valores
         valor_ncatot = df_mov['NCATOT_Tot'].dropna().iloc[-1]
@@ -611,29 +1232,96 @@ def preencher_movimento_cotistas(dem_out: Path, mov_path: Path):
         def formatar(valor):
             return f"{valor:,.3f}".replace(',', 'X').replace('.', ',').replace('X', '.')
 
-        valor_formatado_ncatot = formatar(valor_ncatot)
-        valor_formatado_ncrtot = formatar(valor_ncrtot)
+        return {'D20': formatar(valor_ncatot), 'D22': formatar(valor_ncrtot)}
+
+    except Exception as e:
+        print(f"ERRO — Falha ao ler Movimento de Cotistas: {e}")
+        return None
+
+
+def preencher_movimento_cotistas(dem_out: Path, mov_path: Path):
+    """
+    Lê o arquivo Movimento de Cotistas (CSV), ajusta cabeçalho, extrai os últimos valores
+    das colunas NCATOT_Tot e NCRTOT_Tot, formata e escreve nas células D20 e D22 do Excel.
+    """
+    try:
+        if not dem_out.exists():
+            print(f"ERRO — Arquivo Dem_PL_Modelo_preenchido não encontrado: {dem_out}")
+            return
+
+        valores = ler_movimento_cotistas(mov_path)
+        if valores is None:
+            return
 
-        # 9. Abrir Excel e escrever nas células D20 e D22
+        # Abrir Excel e escrever nas células D20 e D22
         wb = load_workbook(dem_out)
         ws = wb.worksheets[0]
 
-        ws['D20'].value = valor_formatado_ncatot
-        ws['D22'].value = valor_formatado_ncrtot
+        escrever_em_lote(ws, valores, NUM_FMT_TEXTO)
 
-        ws['D20'].number_format = '@'
-        ws['D22'].number_format = '@'
-
-        # 10. Salvar arquivo
+        # Salvar arquivo
         wb.save(dem_out)
 
         print("[OK] Valores inseridos com sucesso:")
-        print(f"D20 (NCATOT_Tot): {valor_formatado_ncatot}")
-        print(f"D22 (NCRTOT_Tot): {valor_formatado_ncrtot}")
+        print(f"D20 (NCATOT_Tot): {valores['D20']}")
+        print(f"D22 (NCRTOT_Tot): {valores['D22']}")
 
     except Exception as e:
         print(f"ERRO — Falha ao preencher Movimento de Cotistas: {e}")
 
+
+def processar_varios_modelos(bal: Path, modelos: List[Tuple[Path, Path, Optional[Dict]]],
+                             carteira: Optional[Path] = None, mov_path: Optional[Path] = None,
+                             max_workers: int = 1) -> List[Path]:
+    """
+    Aplica um mesmo balancete a vários modelos Dem-PL de uma vez.
+ 
+    Balancete, Carteira e Movimento são lidos uma única vez; cada modelo é então
+    preenchido com seu próprio layout de células de total. Por padrão os modelos
+    são salvos em sequência; com max_workers > 1, em processos paralelos (cada
+    processo reimporta o app, então só compensa com modelos grandes e várias
+    CPUs; meça com benchmarks/bench_varios_modelos.py). O diário de proveniência
+    é gravado aqui, no processo principal, sem escrita concorrente no CSV.
+ 
+    Parâmetros
+    ----------
+    bal : Path
+        Balancete (.xlsx).
+    modelos : List[Tuple[Path, Path, Optional[Dict]]]
+        Lista de (modelo_entrada, arquivo_saida, layout). Layout None = LAYOUT_PADRAO.
+    carteira, mov_path : Optional[Path]
+        Carteira Diária (D18) e Movimento de Cotistas (D20/D22), opcionais.
+    max_workers : int
+        Número de processos (1 = sequencial, no próprio processo).
+    """
+    # 1) Dados compartilhados, lidos uma única vez
+    acc_map, cnpj_str = carregar_balancete(bal, BALANCETE_SHEET, saida=Path(modelos[0][1]) if modelos else None)
+ 
+    textos = {}
+    if carteira is not None and carteira.exists():
+        val_d18 = get_last_ncotas(carteira)
+        if val_d18:
+            textos["D18"] = val_d18
+    if mov_path is not None:
+        textos.update(ler_movimento_cotistas(mov_path) or {})
+ 
+    # 2) Preenche os modelos (em paralelo quando há mais de um)
+    args = [(Path(m_in), Path(m_out), acc_map, cnpj_str, layout, textos) for m_in, m_out, layout in modelos]
+    workers = min(max_workers, len(args))
+    if workers <= 1:
+        resultados = [_preencher_modelo(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            resultados = list(ex.map(_preencher_modelo, *zip(*args)))
+ 
+    # 3) Diário de proveniência (sequencial, no processo principal)
+    origem = {"balancete": bal, "carteira": carteira, "movimento": mov_path}
+    saidas = []
+    for (m_in, _, _, _, _, _), (path_saida, changes, totals_por_conta, missing_codes) in zip(args, resultados):
+        _registrar_execucao(m_in, path_saida, cnpj_str, origem, changes, totals_por_conta, missing_codes)
+        saidas.append(path_saida)
+    return saidas
+ 
 # ----- Interface -------------
 
 def abrir_interface():
@@ -736,14 +1424,19 @@ def main():
         print("ERRO — Modelo não encontrado:", dem_in)
         sys.exit(1)
 
-    # 1) mapa de contas
-    acc_map = build_account_map(bal, BALANCETE_SHEET, COL_CONTA, COL_SALDO)
-
-    # 2) captura CNPJ
-    cnpj_str = get_cnpj_from_balancete(bal, BALANCETE_SHEET)
+    # 1) mapa de contas e 2) CNPJ (balancete lido uma única vez, só as colunas necessárias)
+    try:
+        acc_map, cnpj_str = carregar_balancete(bal, BALANCETE_SHEET, saida=Path(DEM_PL_OUT))
+    except ValueError as e:
+        print("ERRO —", e)
+        sys.exit(1)
 
     # 3) executa preenchimento Dem-PL
-    out_file = replace_in_dem_pl(dem_in, Path(DEM_PL_OUT), acc_map, cnpj_str)
+    out_file = replace_in_dem_pl(dem_in, Path(DEM_PL_OUT), acc_map, cnpj_str, {
+        "balancete": bal,
+        "carteira": CARTEIRA_CSV,
+        "movimento": mov_path,
+    })
 
     # 4) executa preenchimento Movimento de Cotistas (D20 e D22)
     preencher_movimento_cotistas(Path(DEM_PL_OUT), mov_path)
@@ -757,5 +1450,130 @@ def main():
 
 
 
+# ----- Linha de comando -------------
+
+def _valor_ptbr(texto: str) -> float:
+    """'1.234,56' ou '1234.56' -> 1234.56"""
+    texto = texto.strip()
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    return float(texto)
+
+
+def ler_layout_modelo(caminho: Path) -> Dict:
+    """
+    Lê o layout de células de um modelo (JSON no formato de LAYOUT_PADRAO) e
+    confere as chaves: blocos só entre os de BLOCOS_RECONHECIDOS e total_geral
+    presente, para que nenhum total deixe de ser gravado em silêncio.
+    """
+    with open(caminho, "r", encoding="utf-8") as f:
+        layout = json.load(f)
+    if not isinstance(layout, dict) or not isinstance(layout.get("blocos"), dict):
+        raise ValueError('esperado {"blocos": {...}, "total_geral": "..."}')
+    desconhecidos = set(layout["blocos"]) - set(BLOCOS_RECONHECIDOS.values())
+    if desconhecidos:
+        raise ValueError(f"blocos desconhecidos {sorted(desconhecidos)}; "
+                         f"use {sorted(BLOCOS_RECONHECIDOS.values())}")
+    if not layout.get("total_geral"):
+        raise ValueError('falta "total_geral"')
+    celulas = list(layout["blocos"].values()) + [layout["total_geral"]]
+    if not all(isinstance(c, str) and re.fullmatch(r"[A-Za-z]{1,3}[1-9]\d*", c) for c in celulas):
+        raise ValueError(f"células inválidas: {celulas}")
+    return layout
+
+
+def executar_linha_de_comando(argv: List[str]) -> int:
+    """
+    Modos sem interface gráfica:
+      python app.py corrigir --balancete B --modelo M --saida S (--correcao ARQ | --conta 61180=1234,56 ...) [--delta]
+      python app.py conta 61180 [61190 ...] --modelo M
+      python app.py varios --balancete B --modelo M1 S1 [LAYOUT1.json] --modelo M2 S2 ... [--paralelo N]
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="app.py", description="Processador Dem-PL")
+    sub = parser.add_subparsers(dest="modo", required=True)
+
+    p_corr = sub.add_parser("corrigir", help="aplica uma correção do balancete a um Dem-PL já gerado")
+    p_corr.add_argument("--balancete", required=True, type=Path, help="balancete usado na geração original")
+    p_corr.add_argument("--modelo", required=True, type=Path, help="modelo Dem-PL usado na geração original")
+    p_corr.add_argument("--saida", required=True, type=Path, help="Dem-PL já gerado, que será corrigido")
+    p_corr.add_argument("--correcao", type=Path, help="arquivo de correção (mesmo formato do balancete)")
+    p_corr.add_argument("--conta", action="append", default=[], metavar="CONTA=VALOR",
+                        help="saldo corrigido (ou variação, com --delta) de uma conta; pode repetir")
+    p_corr.add_argument("--delta", action="store_true", help="valores são variações, não saldos novos")
+    p_corr.add_argument("--carteira", type=Path, help="Carteira da geração original (só para o diário)")
+    p_corr.add_argument("--movimento", type=Path, help="Movimento da geração original (só para o diário)")
+
+    p_conta = sub.add_parser("conta", help="lista as linhas do relatório que cada conta alimenta")
+    p_conta.add_argument("contas", nargs="+")
+    p_conta.add_argument("--modelo", required=True, type=Path)
+
+    p_varios = sub.add_parser("varios", help="aplica um balancete a vários modelos Dem-PL de uma vez")
+    p_varios.add_argument("--balancete", required=True, type=Path)
+    p_varios.add_argument("--modelo", required=True, action="append", nargs="+", metavar="ARQ",
+                          help="MODELO SAIDA [LAYOUT.json]; pode repetir. O JSON segue LAYOUT_PADRAO: "
+                               '{"blocos": {"ACOES": "J34", ...}, "total_geral": "J58"}')
+    p_varios.add_argument("--carteira", type=Path)
+    p_varios.add_argument("--movimento", type=Path)
+    p_varios.add_argument("--paralelo", type=int, default=1, metavar="N", help="processos em paralelo (padrão: 1)")
+
+    args = parser.parse_args(argv)
+
+    if args.modo == "varios":
+        modelos = []
+        for item in args.modelo:
+            if len(item) not in (2, 3):
+                parser.error(f"--modelo espera MODELO SAIDA [LAYOUT.json], recebeu {item!r}")
+            layout = None
+            if len(item) == 3:
+                try:
+                    layout = ler_layout_modelo(Path(item[2]))
+                except (OSError, ValueError) as e:
+                    parser.error(f"layout inválido em {item[2]}: {e}")
+            modelos.append((Path(item[0]), Path(item[1]), layout))
+        saidas = processar_varios_modelos(args.balancete, modelos, args.carteira, args.movimento,
+                                          max_workers=args.paralelo)
+        print("\n[ OK ] Concluído!")
+        for out in saidas:
+            print(f"Arquivo gerado: {out}")
+        return 0
+
+    if args.modo == "conta":
+        compilado = compilar_modelo_arquivo(args.modelo)
+        for conta in args.contas:
+            linhas = linhas_da_conta(compilado, conta)
+            print(f"Conta {conta}: {len(linhas)} célula(s)")
+            for ln in linhas:
+                total = f" -> {ln['total_bloco']}" if ln["total_bloco"] else ""
+                print(f"  {ln['celula']}  {ln['rotulo'] or ''}  [{ln['bloco'] or '-'}]{total}")
+        return 0
+
+    if args.modo == "corrigir":
+        if not args.correcao and not args.conta:
+            parser.error("informe --correcao ou ao menos um --conta CONTA=VALOR")
+        acc_map, cnpj_str = carregar_balancete(args.balancete, BALANCETE_SHEET, saida=args.saida)
+        correcao: Dict[str, float] = {}
+        if args.correcao:
+            correcao.update(carregar_balancete(args.correcao, BALANCETE_SHEET, saida=args.saida)[0])
+        for item in args.conta:
+            conta, _, valor = item.partition("=")
+            if not conta.strip().isdigit() or not valor:
+                parser.error(f"--conta inválido: {item!r} (use CONTA=VALOR)")
+            correcao[conta.strip()] = _valor_ptbr(valor)
+        out = aplicar_correcao(args.modelo, args.saida, acc_map, correcao, como_delta=args.delta,
+                               arquivo_correcao=args.correcao, cnpj_str=cnpj_str,
+                               arquivos_origem={"balancete": args.balancete, "carteira": args.carteira,
+                                                "movimento": args.movimento})
+        print(f"[ OK ] Correção aplicada em: {out}")
+        return 0
+    return 1
+
+
 if __name__ == "__main__":
+    # Necessário no executável congelado (Windows): sem isso, cada processo de
+    # processar_varios_modelos(max_workers > 1) abriria a interface de novo.
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        sys.exit(executar_linha_de_comando(sys.argv[1:]))
     abrir_interface()
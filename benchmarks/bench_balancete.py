@@ -0,0 +1,115 @@
+"""
+Benchmark da leitura do balancete (user-030).
+
+Compara, no mesmo balancete sintético:
+  - build_account_map() + get_cnpj_from_balancete(), cada um lendo o arquivo
+    inteiro com pd.read_excel (como no original);
+  - uma leitura inteira com pd.read_excel, repassada às duas funções;
+  - pd.read_excel(usecols=...) só com as colunas de conta, saldo e CNPJ;
+  - carregar_balancete() a frio (sonda + leitura openpyxl read_only só do
+    intervalo de colunas) e a quente (layout já guardado).
+
+Depois confere os casos de descoberta de colunas: layout padrão, colunas
+deslocadas com cabeçalhos ("Saldo Anterior" ao lado de "Saldo Atual (R$)") e
+contas mascaradas ("1.1.01"), que devem falhar sem deixar layout no cache.
+
+Uso:  python benchmarks/bench_balancete.py [--linhas 30000] [--colunas 26] [--repeticoes 3]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pandas as pd
+
+import app
+from dados_sinteticos import gerar_balancete
+
+
+def medir(fn, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        res = fn()
+        tempos.append(time.perf_counter() - t0)
+    return min(tempos), res
+
+
+def iguais(a, b) -> bool:
+    return a.keys() == b.keys() and all(abs(a[k] - b[k]) < 1e-6 for k in a)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--linhas", type=int, default=30000)
+    ap.add_argument("--colunas", type=int, default=26)
+    ap.add_argument("--repeticoes", type=int, default=3)
+    args = ap.parse_args()
+
+    app.BALANCETE_LAYOUTS_JSON = None
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        bal = gerar_balancete(tmp / "balancete.xlsx", linhas=args.linhas, colunas=args.colunas)
+        cols = [6, 10, 21]
+
+        def duas_leituras():
+            return (app.build_account_map(bal, None, app.COL_CONTA, app.COL_SALDO),
+                    app.get_cnpj_from_balancete(bal))
+
+        def uma_leitura():
+            df = app._read_balancete_df(bal, None)
+            return (app.build_account_map(bal, None, app.COL_CONTA, app.COL_SALDO, df=df),
+                    app.get_cnpj_from_balancete(bal, df=df))
+
+        def usecols():
+            df = pd.read_excel(bal, usecols=cols)
+            return (app._account_map_from_series(df.iloc[:, 2], df.iloc[:, 1]),
+                    app._cnpj_from_series(df.iloc[:, 0]))
+
+        def frio():
+            app._LAYOUTS_BALANCETE.clear()
+            return app.carregar_balancete(bal)
+
+        def quente():
+            return app.carregar_balancete(bal)
+
+        ref = None
+        print(f"balancete: {args.linhas} linhas x {args.colunas} colunas")
+        for nome, fn in [("read_excel x2 (original)", duas_leituras),
+                         ("read_excel x1", uma_leitura),
+                         ("read_excel usecols", usecols),
+                         ("carregar_balancete a frio", frio),
+                         ("carregar_balancete a quente", quente)]:
+            t, (acc_map, cnpj) = medir(fn, args.repeticoes)
+            ref = ref or (acc_map, cnpj)
+            ok = iguais(acc_map, ref[0]) and cnpj == ref[1]
+            print(f"{nome:30s} {t:6.2f}s  mesmo resultado: {ok}")
+
+        print("\ndescoberta de colunas:")
+        app.BALANCETE_LAYOUTS_JSON = "layouts.json"
+        app.DEM_PL_OUT = tmp / "saida.xlsx"
+        app._LAYOUTS_BALANCETE.clear()
+        casos = [("padrão", gerar_balancete(tmp / "padrao.xlsx", linhas=500), "V", "K"),
+                 ("deslocado + cabeçalhos", gerar_balancete(tmp / "desloc.xlsx", linhas=500, deslocamento=1,
+                                                            cabecalhos=True), "W", "L")]
+        for nome, p, c, s in casos:
+            acc_map, _ = app.carregar_balancete(p)
+            print(f"  {nome:24s} igual a {c}/{s}: {iguais(acc_map, app.build_account_map(p, None, c, s))}")
+
+        df = pd.read_excel(casos[0][1])
+        df[df.columns[21]] = [f"1.1.{n % 99:02d}" for n in range(len(df))]
+        df.to_excel(tmp / "mascarado.xlsx", index=False)
+        try:
+            app.carregar_balancete(tmp / "mascarado.xlsx")
+            print("  contas mascaradas        sem erro (inesperado)")
+        except ValueError as e:
+            guardado = "mascarado.xlsx|0" in app._layouts_balancete(tmp / "layouts.json")
+            print(f"  contas mascaradas        ValueError: {e} | layout guardado: {guardado}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark da escrita formatada das células (user-026).
+
+Compara a escrita antiga, célula a célula ("General" -> NUM_FMT_INT_MIL ->
+ALIGN_RIGHT), com escrever_em_lote(), no mesmo modelo sintético. Mede o tempo
+de formatação, o tempo de wb.save, o tamanho do arquivo e do xl/styles.xml e
+confere que as duas saídas são idênticas (valor, formato, fonte, borda,
+alinhamento).
+
+Uso:  python benchmarks/bench_estilos.py [--linhas 3000] [--repeticoes 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from openpyxl import load_workbook
+
+import app
+from dados_sinteticos import gerar_modelo
+
+
+def escrita_antiga(wb, valores):
+    for ws in wb.worksheets:
+        for coord, valor in valores[ws.title].items():
+            cell = ws[coord]
+            cell.value = valor
+            cell.number_format = "General"
+            cell.number_format = app.NUM_FMT_INT_MIL
+            cell.alignment = app.ALIGN_RIGHT
+
+
+def escrita_em_lote(wb, valores):
+    cache = {}
+    for ws in wb.worksheets:
+        app.escrever_em_lote(ws, valores[ws.title], app.NUM_FMT_INT_MIL, app.ALIGN_RIGHT, cache)
+
+
+def medir(modelo: Path, saida: Path, escrever):
+    wb = load_workbook(modelo)
+    valores = {
+        ws.title: {c.coordinate: (c.row * c.column) % 9973 for row in ws.iter_rows(min_col=2) for c in row}
+        for ws in wb.worksheets
+    }
+    t0 = time.perf_counter()
+    escrever(wb, valores)
+    t1 = time.perf_counter()
+    wb.save(saida)
+    t2 = time.perf_counter()
+    with zipfile.ZipFile(saida) as z:
+        styles = z.getinfo("xl/styles.xml").file_size
+    return t1 - t0, t2 - t1, os.path.getsize(saida), styles
+
+
+def saidas_iguais(a: Path, b: Path) -> bool:
+    wa, wb = load_workbook(a), load_workbook(b)
+    for sa, sb in zip(wa.worksheets, wb.worksheets):
+        for ra, rb in zip(sa.iter_rows(), sb.iter_rows()):
+            for x, y in zip(ra, rb):
+                for attr in ("value", "number_format", "font", "border", "alignment"):
+                    if repr(getattr(x, attr)) != repr(getattr(y, attr)):
+                        return False
+    return True
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--linhas", type=int, default=3000)
+    ap.add_argument("--repeticoes", type=int, default=3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        modelo = gerar_modelo(tmp / "modelo.xlsx", linhas=args.linhas)
+        for nome, fn in [("antes (célula a célula)", escrita_antiga), ("depois (escrever_em_lote)", escrita_em_lote)]:
+            res = [medir(modelo, tmp / f"{fn.__name__}.xlsx", fn) for _ in range(args.repeticoes)]
+            fmt = min(r[0] for r in res)
+            save = min(r[1] for r in res)
+            print(f"{nome:28s} formatação={fmt:.2f}s  save={save:.2f}s  "
+                  f"arquivo={res[-1][2]} bytes  styles.xml={res[-1][3]} bytes")
+        iguais = saidas_iguais(tmp / "escrita_antiga.xlsx", tmp / "escrita_em_lote.xlsx")
+        print("saídas idênticas:", iguais)
+
+
+if __name__ == "__main__":
+    main()
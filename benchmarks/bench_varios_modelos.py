@@ -0,0 +1,70 @@
+"""
+Benchmark de processar_varios_modelos() (user-029).
+
+Compara, para N modelos e o mesmo balancete:
+  - uma execução completa por modelo (relendo o balancete a cada vez, como antes);
+  - processar_varios_modelos() sequencial (max_workers=1, padrão);
+  - processar_varios_modelos() com N processos.
+
+O ganho dos processos depende do número de CPUs e do tamanho dos modelos:
+cada processo reimporta o app (pandas, openpyxl, customtkinter).
+
+Uso:  python benchmarks/bench_varios_modelos.py [--modelos 3] [--linhas 1000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import app
+from dados_sinteticos import gerar_balancete, gerar_carteira, gerar_modelo, gerar_movimento
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--modelos", type=int, default=3)
+    ap.add_argument("--linhas", type=int, default=1000)
+    args = ap.parse_args()
+
+    app.PROVENIENCIA_CSV = None
+    app.BALANCETE_LAYOUTS_JSON = None
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        bal = gerar_balancete(tmp / "balancete.xlsx", linhas=20000)
+        carteira = gerar_carteira(tmp / "carteira.csv")
+        mov = gerar_movimento(tmp / "mov.csv")
+        modelos_in = [gerar_modelo(tmp / f"modelo{i}.xlsx", linhas=args.linhas, seed=i) for i in range(args.modelos)]
+        app.DEM_PL_OUT = tmp / "saida.xlsx"
+
+        t0 = time.perf_counter()
+        app.CARTEIRA_CSV = carteira
+        for i, m in enumerate(modelos_in):
+            acc_map = app.build_account_map(bal, None, app.COL_CONTA, app.COL_SALDO)
+            cnpj = app.get_cnpj_from_balancete(bal)
+            out = app.replace_in_dem_pl(m, tmp / f"a{i}.xlsx", acc_map, cnpj)
+            app.preencher_movimento_cotistas(out, mov)
+        t_antes = time.perf_counter() - t0
+
+        modelos = [(m, tmp / f"b{i}.xlsx", None) for i, m in enumerate(modelos_in)]
+        t0 = time.perf_counter()
+        app.processar_varios_modelos(bal, modelos, carteira, mov, max_workers=1)
+        t_seq = time.perf_counter() - t0
+
+        modelos = [(m, tmp / f"c{i}.xlsx", None) for i, m in enumerate(modelos_in)]
+        t0 = time.perf_counter()
+        app.processar_varios_modelos(bal, modelos, carteira, mov, max_workers=args.modelos)
+        t_par = time.perf_counter() - t0
+
+    print(f"CPUs: {os.cpu_count()}  modelos: {args.modelos}  linhas/aba: {args.linhas}")
+    print(f"uma execução por modelo:         {t_antes:.2f}s")
+    print(f"processar_varios_modelos (seq.):  {t_seq:.2f}s")
+    print(f"processar_varios_modelos ({args.modelos} proc.): {t_par:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
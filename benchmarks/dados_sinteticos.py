@@ -0,0 +1,78 @@
+"""
+Geração de arquivos sintéticos (modelo Dem-PL, balancete, Carteira e Movimento)
+usados pelos scripts de benchmark desta pasta.
+"""
+import random
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.styles import Border, Font, Side
+
+BLOCOS = [
+    "Ações e Opções",
+    "Renda fixa e outros valores mobiliários",
+    "Demais receitas",
+    "Demais despesas",
+]
+CONTAS = range(60000, 62000)
+
+
+def gerar_modelo(path: Path, abas: int = 3, linhas: int = 3000, colunas: int = 8, seed: int = 1) -> Path:
+    """Modelo com 'abas x linhas x colunas' células de contas ("60123 + 61456"), com fontes/bordas variadas."""
+    random.seed(seed)
+    wb = Workbook()
+    fino = Side(style="thin")
+    for a in range(abas):
+        ws = wb.active if a == 0 else wb.create_sheet(f"Aba{a}")
+        if a == 0:
+            ws.title = "DemPL"
+        for r in range(1, linhas + 1):
+            if r % 700 == 1:
+                ws.cell(r, 1, BLOCOS[(r // 700) % 4])
+            for c in range(2, colunas + 2):
+                cell = ws.cell(r, c, f"{random.choice(CONTAS)} + {random.choice(CONTAS)}")
+                if c % 2:
+                    cell.font = Font(bold=True)
+                if c % 3 == 0:
+                    cell.border = Border(bottom=fino)
+    wb.save(path)
+    return path
+
+
+def gerar_balancete(path: Path, linhas: int = 2000, colunas: int = 22, deslocamento: int = 0,
+                    cabecalhos: bool = False, seed: int = 2) -> Path:
+    """
+    Balancete no layout padrão (CNPJ em G, saldo em K, conta em V). Com
+    'deslocamento' as colunas andam para a direita; com 'cabecalhos' recebem
+    nomes reais ("Cód. Conta", "Saldo Anterior", "Saldo Atual (R$)", "CNPJ").
+    Demais colunas são preenchidas com texto e números irrelevantes.
+    """
+    random.seed(seed)
+    nomes = [f"Col{i}" for i in range(colunas + deslocamento)]
+    i_cnpj, i_ant, i_saldo, i_conta = 6 + deslocamento, 9 + deslocamento, 10 + deslocamento, 21 + deslocamento
+    if cabecalhos:
+        nomes[i_cnpj], nomes[i_ant], nomes[i_saldo], nomes[i_conta] = (
+            "CNPJ", "Saldo Anterior", "Saldo Atual (R$)", "Cód. Conta")
+    rows = []
+    contas = list(CONTAS)
+    for n in range(linhas):
+        conta = contas[n % len(contas)]
+        row = [f"txt{n % 7}" if i % 2 else round(random.uniform(0, 100), 2) for i in range(len(nomes))]
+        row[i_cnpj] = "43096339000146"
+        row[i_ant] = round(random.uniform(-1e7, 1e7), 2)
+        row[i_saldo] = round(random.uniform(-1e7, 1e7), 2)
+        row[i_conta] = str(conta)
+        rows.append(row)
+    pd.DataFrame(rows, columns=nomes).to_excel(path, index=False)
+    return path
+
+
+def gerar_carteira(path: Path) -> Path:
+    path.write_text("a;123456,789;1,234567\nb;223456,789;2,234567\nX;NCotas;VlCotas\nrodape;;\n", encoding="latin-1")
+    return path
+
+
+def gerar_movimento(path: Path) -> Path:
+    path.write_text("1.234,5;2.345,6\nNCATOT_Tot;NCRTOT_Tot\n", encoding="latin-1")
+    return path